@@ -82,9 +82,24 @@ def _agg_ver_aug(pks, msgs, sig, ciphersuite, ver_fn):
 
 aggregate_verify_aug = partial(_agg_ver_aug, ver_fn=aggregate_verify)
 
+# self-test for aggregate verification: good aggregates must verify, bad ones must not
+def _test_aggregate(keygen_fn, sign_fn, ver_fn, ver_basic_fn, csuite):
+    keys = [ keygen_fn(b"aggregate test key %d" % idx) for idx in range(0, 3) ]
+    pks = [ pk for (_, pk) in keys ]
+    msgs = [ b"aggregate test message %d" % idx for idx in range(0, 3) ]
+    sig = aggregate([ sign_fn(x_prime, msg, csuite) for ((x_prime, _), msg) in zip(keys, msgs) ])
+    assert ver_fn(pks, msgs, sig, csuite)
+    assert ver_basic_fn(pks, msgs, sig, csuite)
+    assert not ver_fn(pks, msgs[:-1] + [b'wrong message'], sig, csuite)
+    assert not ver_fn(pks[1:] + pks[:1], msgs, sig, csuite)
+    assert not ver_basic_fn(pks, [msgs[0]] * len(msgs), sig, csuite)
+
 if __name__ == "__main__":
     def main():
         opts = get_cmdline_options()
+        if opts.run_tests:
+            _test_aggregate(keygen, sign, aggregate_verify, aggregate_verify_basic, g1suite(SigType.basic))
+            return
         if opts.sigtype == SigType.message_augmentation:
             sig_fn = sign_aug
             ver_fn = verify_aug
@@ -3,7 +3,7 @@
 from functools import partial
 from itertools import chain
 
-from bls_sig_g1 import _agg_ver_nul, _agg_ver_aug, _keygen, _sign, _sign_aug, _verify_aug
+from bls_sig_g1 import _agg_ver_nul, _agg_ver_aug, _keygen, _sign, _sign_aug, _test_aggregate, _verify_aug
 from consts import g2suite
 from curve_ops import g1gen, point_neg, subgroup_check_g1, subgroup_check_g2
 from opt_swu_g2 import map2curve_osswu2
@@ -55,6 +55,9 @@ aggregate_verify_aug = partial(_agg_ver_aug, ver_fn=aggregate_verify)
 if __name__ == "__main__":
     def main():
         opts = get_cmdline_options()
+        if opts.run_tests:
+            _test_aggregate(keygen, sign, aggregate_verify, aggregate_verify_basic, g2suite(SigType.basic))
+            return
         if opts.sigtype == SigType.message_augmentation:
             sig_fn = sign_aug
             ver_fn = verify_aug
@@ -31,6 +31,14 @@ def from_jacobian(P):
     z3inv = ~(P[2] ** 3)
     return (P[0] * P[2] * z3inv, P[1] * z3inv)
 
+# convert many points out of Jacobian coordinates using a single inversion
+def from_jacobian_batch(Ps):
+    Ps = list(Ps)
+    if not Ps:
+        return []
+    z3invs = type(Ps[0][2]).batch_invert([ P[2] ** 3 for P in Ps ])
+    return [ (P[0] * P[2] * z3inv, P[1] * z3inv) for (P, z3inv) in zip(Ps, z3invs) ]
+
 # point equality or co-z repr
 def _point_eq_coz(P, Q, coZ):
     (X1, Y1, Z1) = P
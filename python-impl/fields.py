@@ -12,8 +12,21 @@
 # * added trivial __reversed__ method to Fq to support generic sgn0 impl
 # * q -> p in frob_coeffs for consistency with the rest of this library
 # * moved sgn0 and sqrt_F2 into this file
-
-from copy import deepcopy
+# * Fq inversion and exponentiation use the builtin pow() rather than Python loops
+# * Fq2 multiplication uses Karatsuba; Fq2 squaring uses the complex method
+# * added Fq.batch_invert (Montgomery's trick) and Fq2.batch_invert
+# * zero and one of each field are cached for internal use
+# * field elements are immutable, so deepcopy returns the element itself
+# * Fq2 multiplication and squaring work on plain ints, reducing once per coefficient
+# * Fq6 and Fq12 multiplication use lazy reduction, reducing once per Fq coefficient
+# * Fq6 and Fq12 multiplication are unrolled and use Karatsuba over Fq2 and Fq6
+# * Fq2 addition, subtraction, and negation work on plain ints
+# * added an unchecked Fq constructor (_fq_from_int) for the extension fields' inner loops
+# * extension-field exponentiation uses a width-4 sliding window for long exponents
+# * added Granger-Scott cyclotomic squaring for Fq12, used by Fq12.cyclotomic_pow
+# * FieldExtBase caches the result of __bool__
+
+from functools import lru_cache
 from consts import p
 
 # "sign" of x: returns -1 if x is the lexically larger of x and -1 * x, else returns 1
@@ -85,29 +98,46 @@ class Fq(int):
         return "Fq(" + hex(int(self)) + ")"
 
     def __pow__(self, other):
-        if other == 0:
-            return Fq(self.Q, 1)
-        if other == 1:
-            return self
-        if other % 2 == 0:
-            return (self * self) ** (other // 2)
-        return (self * self) ** (other // 2) * self
+        return Fq(self.Q, pow(int(self), other, self.Q))
 
     def qi_power(self, _):
         return self
 
     def __invert__(self):
         """
-        Extended euclidian algorithm for inversion.
+        Modular inversion using the builtin pow(). By convention, ~0 == 0.
         """
-        x0, x1, y0, y1 = 1, 0, 0, 1
-        a = int(self.Q)
-        b = int(self)
-        while a != 0:
-            q, b, a = b // a, a, b % a
-            x0, x1 = x1, x0 - q * x1
-            y0, y1 = y1, y0 - q * y1
-        return Fq(self.Q, x0)
+        if not self:
+            return self
+        return Fq(self.Q, pow(int(self), -1, self.Q))
+
+    @classmethod
+    def batch_invert(cls, xs):
+        """
+        Montgomery's trick: inverts every element of xs using one inversion
+        and 3(n-1) multiplications. Zero elements map to zero, as with ~.
+        """
+        xs = list(xs)
+        prods = [None] * len(xs)
+        acc = None
+        for (idx, x) in enumerate(xs):
+            if x:
+                acc = x if acc is None else acc * x
+            prods[idx] = acc
+        if acc is None:
+            return xs
+
+        ret = [None] * len(xs)
+        inv = ~acc
+        for idx in reversed(range(0, len(xs))):
+            x = xs[idx]
+            if not x:
+                ret[idx] = x
+                continue
+            prev = prods[idx - 1] if idx > 0 else None
+            ret[idx] = inv if prev is None else inv * prev
+            inv = inv * x
+        return ret
 
     def __floordiv__(self, other):
         if (isinstance(other, int) and
@@ -124,7 +154,8 @@ class Fq(int):
         yield self
 
     def __deepcopy__(self, memo):
-        return Fq(self.Q, int(self))
+        # field elements are immutable
+        return self
 
     @classmethod
     def zero(cls, Q):
@@ -134,11 +165,30 @@ class Fq(int):
     def one(cls, Q):
         return Fq(Q, 1)
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _zero_cached(cls, Q):
+        return cls.zero(Q)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _one_cached(cls, Q):
+        return cls.one(Q)
+
     @classmethod
     def from_fq(cls, _, fq):
         return fq
 
 
+# Unchecked construction for the extension fields' inner loops: skips the
+# isinstance checks and super() dispatch of Fq's operators. x must be a
+# plain int (or Fq); arithmetic on Fq operands should go through int.__op__.
+def _fq_from_int(Q, x):
+    ret = int.__new__(Fq, x % Q)
+    ret.Q = Q
+    return ret
+
+
 class FieldExtBase(tuple):
     """
     Represents an extension of a field (or extension of an extension).
@@ -150,6 +200,7 @@ class FieldExtBase(tuple):
     embedding = None
     root = None
     Q = None
+    _nonzero = None
 
     def __new__(cls, Q, *args):
         new_args = args[:]
@@ -175,6 +226,9 @@ class FieldExtBase(tuple):
 
     def __neg__(self):
         cls = type(self)
+        if cls.basefield is Fq:
+            Q = self.Q
+            return _new_like(self, ( _fq_from_int(Q, int.__neg__(x)) for x in self ))
         ret = super().__new__(cls, (-x for x in self))
         ret.Q = self.Q
         ret.root = self.root
@@ -182,11 +236,16 @@ class FieldExtBase(tuple):
 
     def __add__(self, other):
         cls = type(self)
+        if cls.basefield is Fq and isinstance(other, cls):
+            # add the coefficients as plain ints, reducing once per coefficient
+            Q = self.Q
+            return _new_like(self, ( _fq_from_int(Q, int.__add__(a, b)) for (a, b) in zip(self, other) ))
         if not isinstance(other, cls):
             if type(other) != int and other.extension > self.extension:  # pylint: disable=unidiomatic-typecheck
                 return NotImplemented
-            other_new = [cls.basefield.zero(self.Q) for _ in self]
-            other_new[0] = other_new[0] + other
+            zero = cls.basefield._zero_cached(self.Q)
+            other_new = [zero] * cls.embedding
+            other_new[0] = zero + other
         else:
             other_new = other
 
@@ -199,6 +258,10 @@ class FieldExtBase(tuple):
         return self.__add__(other)
 
     def __sub__(self, other):
+        cls = type(self)
+        if cls.basefield is Fq and isinstance(other, cls):
+            Q = self.Q
+            return _new_like(self, ( _fq_from_int(Q, int.__sub__(a, b)) for (a, b) in zip(self, other) ))
         return self + (-other)
 
     def __rsub__(self, other):
@@ -207,6 +270,9 @@ class FieldExtBase(tuple):
     def __mul__(self, other):
         cls = type(self)
         if isinstance(other, int):
+            if cls.basefield is Fq:
+                Q = self.Q
+                return _new_like(self, ( _fq_from_int(Q, int.__mul__(a, other)) for a in self ))
             ret = super().__new__(cls, (a * other for a in self))
             ret.Q = self.Q
             ret.root = self.root
@@ -214,21 +280,9 @@ class FieldExtBase(tuple):
         if cls.extension < other.extension:
             return NotImplemented
 
-        buf = [cls.basefield.zero(self.Q) for _ in self]
-
-        for i, x in enumerate(self):
-            if cls.extension == other.extension:
-                for j, y in enumerate(other):
-                    if x and y:
-                        if i+j >= self.embedding:
-                            buf[(i + j) % self.embedding] += (x * y *
-                                                              self.root)
-                        else:
-                            buf[(i + j) % self.embedding] += x * y
-            else:
-                if x:
-                    buf[i] = x * other
-        ret = super().__new__(cls, buf)
+        # other is in a subfield; products within a field are done by the subclasses
+        zero = cls.basefield._zero_cached(self.Q)
+        ret = super().__new__(cls, (x * other if x else zero for x in self))
         ret.Q = self.Q
         ret.root = self.root
         return ret
@@ -246,9 +300,9 @@ class FieldExtBase(tuple):
             if isinstance(other, (FieldExtBase, int)):
                 if (not isinstance(other, FieldExtBase)
                    or self.extension > other.extension):
-                    for i in range(1, self.embedding):
-                        if self[i] != (type(self.root).zero(self.Q)):
-                            return False
+                    # other is in a subfield: all but the first coefficient must be zero
+                    if any(self[1:]):
+                        return False
                     return self[0] == other
                 return NotImplemented
             return NotImplemented
@@ -271,23 +325,62 @@ class FieldExtBase(tuple):
                                                              for a in self])
                 + ")")
 
-    def __pow__(self, e):
-        assert isinstance(e, int) and e >= 0
-        ans = type(self).one(self.Q)
-        base = self
-        ans.root = self.root
-
-        while e:
-            if e & 1:
-                ans *= base
+    def square(self):
+        return self * self
 
-            base *= base
-            e >>= 1
+    def __pow__(self, e):
+        return self._pow(e, type(self).square)
 
+    def _pow(self, e, square):
+        # square is the squaring function to use, e.g., Fq12.cyclotomic_square
+        assert isinstance(e, int) and e >= 0
+        if e == 0:
+            # not _one_cached: that instance is shared, so it must not be handed to callers
+            return type(self).one(self.Q)
+        if e.bit_length() < 32:
+            # for short exponents, precomputing the window table costs more than it saves
+            ans = type(self)._one_cached(self.Q)
+            base = self
+            while e:
+                if e & 1:
+                    ans *= base
+                base = square(base)
+                e >>= 1
+            return ans
+
+        # sliding window of width 4 over the odd powers self^1, self^3, ..., self^15
+        sq = square(self)
+        table = [self]
+        for _ in range(0, 7):
+            table.append(table[-1] * sq)
+
+        bits = bin(e)[2:]
+        ans = None
+        idx = 0
+        while idx < len(bits):
+            if bits[idx] == '0':
+                ans = square(ans)
+                idx += 1
+                continue
+            # longest window of at most 4 bits that ends in a 1
+            end = min(idx + 4, len(bits))
+            while bits[end - 1] == '0':
+                end -= 1
+            window = int(bits[idx:end], 2)
+            if ans is None:
+                ans = table[window >> 1]
+            else:
+                for _ in range(idx, end):
+                    ans = square(ans)
+                ans = ans * table[window >> 1]
+            idx = end
         return ans
 
     def __bool__(self):
-        return any(x for x in self)
+        # elements are immutable, so the result is computed once and cached
+        if self._nonzero is None:
+            self._nonzero = any(self)
+        return self._nonzero
 
     def set_root(self, _root):
         self.root = _root
@@ -300,10 +393,21 @@ class FieldExtBase(tuple):
     def one(cls, Q):
         return cls.from_fq(Q, Fq(Q, 1))
 
+    # shared instances for internal use; field elements are never mutated in place
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _zero_cached(cls, Q):
+        return cls.zero(Q)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _one_cached(cls, Q):
+        return cls.one(Q)
+
     @classmethod
     def from_fq(cls, Q, fq):
         y = cls.basefield.from_fq(Q, fq)
-        z = cls.basefield.zero(Q)
+        z = cls.basefield._zero_cached(Q)  # pylint: disable=protected-access
         ret = super().__new__(cls,
                               (z if i else y for i in range(cls.embedding)))
         ret.Q = Q
@@ -317,11 +421,8 @@ class FieldExtBase(tuple):
         return ret
 
     def __deepcopy__(self, memo):
-        cls = type(self)
-        ret = super().__new__(cls, (deepcopy(a, memo) for a in self))
-        ret.Q = self.Q
-        ret.root = self.root
-        return ret
+        # field elements are immutable
+        return self
 
     def qi_power(self, i):
         cls = type(self)
@@ -335,6 +436,53 @@ class FieldExtBase(tuple):
         ret.root = self.root
         return ret
 
+def _new_like(x, coeffs):
+    # new element of the same field as x, skipping the checks in FieldExtBase.__new__
+    ret = tuple.__new__(type(x), coeffs)
+    ret.Q = x.Q
+    ret.root = x.root
+    return ret
+
+###
+## Straight-line tower multiplication on plain ints. An Fq2 element is a
+## pair of ints and an Fq6 element is a triple of pairs. Inputs need not
+## be reduced, and neither are the outputs; see Fq6.__mul__ and Fq12.__mul__.
+###
+def _fq2_mul(a, b):
+    # Karatsuba, with u^2 = -1
+    v0 = a[0] * b[0]
+    v1 = a[1] * b[1]
+    return (v0 - v1, (a[0] + a[1]) * (b[0] + b[1]) - v0 - v1)
+
+def _fq6_mul(a, b):
+    # Karatsuba for cubic extensions: 6 Fq2 products rather than 9.
+    # Multiplication by the root, v^3 = u + 1, is inlined: (x0, x1) -> (x0 - x1, x0 + x1)
+    (a0, a1, a2) = a
+    (b0, b1, b2) = b
+    (v00, v01) = _fq2_mul(a0, b0)
+    (v10, v11) = _fq2_mul(a1, b1)
+    (v20, v21) = _fq2_mul(a2, b2)
+    (s00, s01) = _fq2_mul((a1[0] + a2[0], a1[1] + a2[1]), (b1[0] + b2[0], b1[1] + b2[1]))
+    (s10, s11) = _fq2_mul((a0[0] + a1[0], a0[1] + a1[1]), (b0[0] + b1[0], b0[1] + b1[1]))
+    (s20, s21) = _fq2_mul((a0[0] + a2[0], a0[1] + a2[1]), (b0[0] + b2[0], b0[1] + b2[1]))
+    # c0 = v0 + (u + 1)((a1 + a2)(b1 + b2) - v1 - v2)
+    (x0, x1) = (s00 - v10 - v20, s01 - v11 - v21)
+    # c1 = (a0 + a1)(b0 + b1) - v0 - v1 + (u + 1) v2
+    # c2 = (a0 + a2)(b0 + b2) - v0 - v2 + v1
+    return ((v00 + x0 - x1, v01 + x0 + x1),
+            (s10 - v00 - v10 + v20 - v21, s11 - v01 - v11 + v20 + v21),
+            (s20 - v00 - v20 + v10, s21 - v01 - v21 + v11))
+
+def _fq6_ints(x):
+    return tuple( (int(c[0]), int(c[1])) for c in x )
+
+def _fq6_from_ints(x, acc):
+    # Fq6 element in the same field as x, from a triple of unreduced int pairs.
+    # Each coefficient is reduced only once, here.
+    Q = x.Q
+    return _new_like(x, ( _new_like(x[0], (_fq_from_int(Q, c0), _fq_from_int(Q, c1)))
+                          for (c0, c1) in acc ))
+
 class Fq2(FieldExtBase):
     # Fq2 is constructed as Fq(u) / (u^2 - i) where i = -1
     extension = 2
@@ -345,16 +493,52 @@ class Fq2(FieldExtBase):
         # pylint: disable=super-init-not-called
         super().set_root(Fq(Q, -1))
 
+    def __mul__(self, other):
+        if other is self:
+            return self.square()
+        if not isinstance(other, Fq2):
+            return super().__mul__(other)
+        Q = self.Q
+        return _new_like(self, ( _fq_from_int(Q, c) for c in self._mul_unreduced(other) ))
+
+    def _mul_unreduced(self, other):
+        # Karatsuba: 3 multiplications rather than 4. Returns the coefficients
+        # as plain, unreduced ints; callers reduce once when they are done.
+        return _fq2_mul((int(self[0]), int(self[1])), (int(other[0]), int(other[1])))
+
+    def square(self):
+        # complex squaring: (a + bu)^2 = (a + b)(a - b) + 2abu
+        (a, b) = (int(a) for a in self)
+        Q = self.Q
+        return _new_like(self, (_fq_from_int(Q, (a + b) * (a - b)), _fq_from_int(Q, 2 * a * b)))
+
+    def norm(self):
+        # N(a + bu) = (a + bu)(a - bu) = a^2 + b^2
+        (a, b) = (int(a) for a in self)
+        return _fq_from_int(self.Q, a * a + b * b)
+
     def __invert__(self):
         a, b = self
-        factor = ~(a * a + b * b)
-        ret = Fq2(self.Q, a * factor, -b * factor)
-        return ret
+        factor = ~self.norm()
+        Q = self.Q
+        return _new_like(self, (_fq_from_int(Q, int.__mul__(a, factor)),
+                                _fq_from_int(Q, -int.__mul__(b, factor))))
+
+    @classmethod
+    def batch_invert(cls, xs):
+        """
+        Inverts every element of xs as conj(x) / N(x), sharing a single Fq
+        inversion among all of the norms. Zero elements map to zero.
+        """
+        xs = list(xs)
+        factors = Fq.batch_invert([ x.norm() for x in xs ])
+        return [ Fq2(x.Q, x[0] * factor, -x[1] * factor) for (x, factor) in zip(xs, factors) ]
 
     def mul_by_nonresidue(self):
         # multiply by u + 1
         a, b = self
-        return Fq2(self.Q, a - b, a + b)
+        Q = self.Q
+        return _new_like(self, (_fq_from_int(Q, int.__sub__(a, b)), _fq_from_int(Q, int.__add__(a, b))))
 
 # roots of unity, used for computing square roots in Fq2
 rv1 = 0x6af0e0437ff400b6831e36d6bd17ffe48395dabc2d3435e77f76e17009241c5ee67992f72ec05f4c81084fbede3cc09
@@ -389,10 +573,17 @@ class Fq6(FieldExtBase):
         # TODO(mariano54): no inverse  pylint: disable=fixme
         return Fq6(self.Q, g0 * factor, g1 * factor, g2 * factor)
 
+    def __mul__(self, other):
+        if not isinstance(other, Fq6):
+            return super().__mul__(other)
+        # lazy reduction: Fq2 products are accumulated as unreduced int pairs,
+        # and each coefficient is reduced only once, in _fq6_from_ints
+        return _fq6_from_ints(self, _fq6_mul(_fq6_ints(self), _fq6_ints(other)))
+
     def mul_by_nonresidue(self):
         # multiply by v
         a, b, c = self
-        return Fq6(self.Q, c * self.root, a, b)
+        return Fq6(self.Q, c.mul_by_nonresidue(), a, b)
 
 class Fq12(FieldExtBase):
     # Fq12 is constructed as Fq6(w) / (w^2 - k) where k = v
@@ -409,6 +600,69 @@ class Fq12(FieldExtBase):
         factor = ~(a*a - (b*b).mul_by_nonresidue())
         return Fq12(self.Q, a * factor, -b * factor)
 
+    def __mul__(self, other):
+        if not isinstance(other, Fq12):
+            return super().__mul__(other)
+        # Karatsuba over Fq6 with lazy reduction, as in Fq6.__mul__:
+        # (a0 + a1 w)(b0 + b1 w) = (v0 + v v1) + ((a0 + a1)(b0 + b1) - v0 - v1) w
+        ((a0, a1), (b0, b1)) = ( [ _fq6_ints(x) for x in y ] for y in (self, other) )
+        v0 = _fq6_mul(a0, b0)
+        v1 = _fq6_mul(a1, b1)
+        vs = _fq6_mul(tuple( (x[0] + y[0], x[1] + y[1]) for (x, y) in zip(a0, a1) ),
+                      tuple( (x[0] + y[0], x[1] + y[1]) for (x, y) in zip(b0, b1) ))
+        # v * (c0, c1, c2) = ((u + 1) c2, c0, c1)
+        ((x00, x01), (x10, x11), (x20, x21)) = v0
+        ((y00, y01), (y10, y11), (y20, y21)) = v1
+        c0 = ((x00 + y20 - y21, x01 + y20 + y21), (x10 + y00, x11 + y01), (x20 + y10, x21 + y11))
+        c1 = tuple( (s[0] - x[0] - y[0], s[1] - x[1] - y[1]) for (s, x, y) in zip(vs, v0, v1) )
+        return _new_like(self, (_fq6_from_ints(self[0], c0), _fq6_from_ints(self[1], c1)))
+
+    def cyclotomic_square(self):
+        """
+        Granger-Scott squaring for elements of the cyclotomic subgroup, e.g.,
+        after the easy part of the final exponentiation. Incorrect for other
+        elements. See Granger and Scott, "Faster squaring in the cyclotomic
+        subgroup of sixth degree extensions." PKC 2010.
+
+        Fq2 values are handled as unreduced int pairs, as in Fq6.__mul__.
+        """
+        def sqr(a):
+            # complex squaring in Fq2
+            return ((a[0] + a[1]) * (a[0] - a[1]), 2 * a[0] * a[1])
+
+        def fq4_square(a, b):
+            # (a + bw^3)^2, where (w^3)^2 = u + 1
+            t0 = sqr(a)
+            t1 = sqr(b)
+            tab = sqr((a[0] + b[0], a[1] + b[1]))
+            return ((t1[0] - t1[1] + t0[0], t1[0] + t1[1] + t0[1]),
+                    (tab[0] - t0[0] - t1[0], tab[1] - t0[1] - t1[1]))
+
+        def sub(t, z):
+            # 3t - 2z
+            return (3 * t[0] - 2 * z[0], 3 * t[1] - 2 * z[1])
+
+        def add(t, z):
+            # 3t + 2z
+            return (3 * t[0] + 2 * z[0], 3 * t[1] + 2 * z[1])
+
+        ((z0, z4, z3), (z2, z1, z5)) = ( _fq6_ints(x) for x in self )
+        (t0, t1) = fq4_square(z0, z1)
+        z0 = sub(t0, z0)
+        z1 = add(t1, z1)
+        (t0, t1) = fq4_square(z2, z3)
+        (t2, t3) = fq4_square(z4, z5)
+        z4 = sub(t0, z4)
+        z5 = add(t1, z5)
+        z2 = add((t3[0] - t3[1], t3[0] + t3[1]), z2)
+        z3 = sub(t2, z3)
+        return _new_like(self, (_fq6_from_ints(self[0], (z0, z4, z3)),
+                                _fq6_from_ints(self[1], (z2, z1, z5))))
+
+    def cyclotomic_pow(self, e):
+        # self ** e for self in the cyclotomic subgroup, squaring with cyclotomic_square
+        return self._pow(e, Fq12.cyclotomic_square)
+
 # Frobenius coefficients for raising elements to q**i -th powers
 # These are specific to this given q
 frob_coeffs = {
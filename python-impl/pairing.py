@@ -10,12 +10,14 @@
 # * uses curve impl from curve_ops
 # * only supports BLS12-381
 # * Miller loop implementation avoids computing inversions
+# * multi_pairing converts all G1 inputs to affine with one batched inversion
+# * final exponentiation does the easy part first, then uses cyclotomic squaring
 
 from functools import reduce
 from operator import mul
 
 from consts import p, ell_u, k_final
-from curve_ops import from_jacobian, point_double, point_add, to_coZ
+from curve_ops import from_jacobian, from_jacobian_batch, point_double, point_add, to_coZ
 from fields import Fq, Fq2, Fq6, Fq12
 
 # constants for untwisting
@@ -87,10 +89,11 @@ def _miller_loop(T, P, Q):
 
 def _final_exp(elm):
     assert isinstance(elm, Fq12)
-    ret = pow(elm, k_final)
+    # easy part, elm^((p^6 - 1)(p^2 + 1)), maps into the cyclotomic subgroup...
+    ret = elm.qi_power(6) / elm
     ret = ret.qi_power(2) * ret
-    ret = ret.qi_power(6) / ret
-    return ret
+    # ...where the hard part can use cyclotomic squaring
+    return ret.cyclotomic_pow(k_final)
 
 def pairing(P, Q):
     assert all( isinstance(pp, Fq) for pp in P )
@@ -98,6 +101,12 @@ def pairing(P, Q):
     return _final_exp(_miller_loop(abs(ell_u), P, Q))
 
 def multi_pairing(Ps, Qs):
+    # Ps and Qs may be iterators (e.g., from aggregate_verify); read them only once
+    (Ps, Qs) = (list(Ps), list(Qs))
     assert all( isinstance(pp, Fq) for P in Ps for pp in P )
     assert all( isinstance(pp, Fq2) for Q in Qs for pp in Q )
+    # convert all Jacobian Ps to affine at once rather than once per Miller loop
+    jac_idxs = [ idx for (idx, P) in enumerate(Ps) if len(P) == 3 ]
+    for (idx, P) in zip(jac_idxs, from_jacobian_batch( Ps[idx] for idx in jac_idxs )):
+        Ps[idx] = P
     return _final_exp(reduce(mul, ( _miller_loop(abs(ell_u), P, Q) for (P, Q) in zip(Ps, Qs) ), Fq12.one(p)))